@@ -1,13 +1,21 @@
+import atexit
+import functools
 import mimetypes
 import os
+import queue
+import re
+import shutil
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 from urllib.parse import urlparse, parse_qs
 
-import requests
 import yt_dlp
 from playwright.sync_api import sync_playwright
 
+from http_session import SESSION
 from image_model import predict_image
 from video_model import predict_video
 from plagiarism_scanner import scan_file, scan_text
@@ -21,6 +29,71 @@ VIDEO_DIR = DATA_DIR / "videos"
 IMAGE_DIR.mkdir(parents=True, exist_ok=True)
 VIDEO_DIR.mkdir(parents=True, exist_ok=True)
 MERGE_OUTPUT_FORMAT = "mp4"
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "4"))
+
+# Facebook URLs that point at video content (Watch, Reels, Stories)
+_FB_VIDEO_RE = re.compile(r"/watch|/reel|/videos|/stories|story_fbid", re.I)
+
+# -------------------------
+# Browser pool
+# -------------------------
+class BrowserPagePool:
+    """Keeps one Chromium alive for the whole process and hands out pages.
+
+    Launching a browser costs ~1-2 s; a context + page on an already-running
+    browser is nearly free. The queue caps how many pages are open at once.
+    """
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE):
+        # Playwright's sync API is thread-affine: a browser can only be
+        # driven by the thread that launched it. Keep one browser per
+        # calling thread; the slot queue still caps total open pages.
+        self._local = threading.local()
+        self._instances = []
+        self._lock = threading.Lock()
+        self._slots = queue.Queue()
+        for _ in range(size):
+            self._slots.put(None)
+
+    def _ensure_browser(self):
+        browser = getattr(self._local, "browser", None)
+        if browser is None:
+            playwright = sync_playwright().start()
+            browser = playwright.chromium.launch(headless=True)
+            self._local.browser = browser
+            with self._lock:
+                self._instances.append((playwright, browser))
+        return browser
+
+    @contextmanager
+    def acquire(self):
+        self._slots.get()
+        try:
+            # Launch/navigation failures are routine (no Chromium, flaky
+            # pages); the slot must go back even when they raise
+            context = self._ensure_browser().new_context()
+            try:
+                yield context.new_page()
+            finally:
+                context.close()
+        finally:
+            self._slots.put(None)
+
+    def close(self):
+        with self._lock:
+            instances, self._instances = self._instances, []
+        for playwright, browser in instances:
+            # Best effort: browsers launched on worker threads can't
+            # always be driven from the atexit thread
+            try:
+                browser.close()
+                playwright.stop()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+pool = BrowserPagePool()
+atexit.register(pool.close)
 
 # -------------------------
 # Platform detection
@@ -35,9 +108,7 @@ def detect_platform(url: str) -> str:
         return "youtube"
 
     # Fallback to meta-tag sniff
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
+    with pool.acquire() as page:
         try:
             page.goto(url, timeout=60000, wait_until="domcontentloaded")
             page.wait_for_timeout(3000)
@@ -47,17 +118,16 @@ def detect_platform(url: str) -> str:
                 return "youtube"
         except Exception as e:
             print(f"[WARN] Failed meta-tag sniff: {e}")
-        finally:
-            browser.close()
 
     return None
 
 # -------------------------
 # MIME type helper
 # -------------------------
+@functools.lru_cache(maxsize=1024)
 def head_content_type(url: str, timeout=8) -> str | None:
     try:
-        r = requests.head(url, allow_redirects=True, timeout=timeout)
+        r = SESSION.head(url, allow_redirects=True, timeout=timeout)
         ct = r.headers.get("Content-Type")
         if ct:
             return ct.split(";")[0].strip().lower()
@@ -79,71 +149,116 @@ def get_media_type_from_url(url: str) -> str | None:
         return "video"
     return None
 
+def classify_many(urls: list[str]) -> dict[str, str | None]:
+    """Classify media URLs with their HEAD probes running in parallel.
+
+    The probes are independent I/O, so fanning them out turns sum-of-latencies
+    into max-latency for a scraped batch.
+    """
+    if not urls:
+        return {}
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        types = executor.map(get_media_type_from_url, urls)
+        return dict(zip(urls, types))
+
 # -------------------------
 # Scraper
 # -------------------------
+SCRAPE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                  "AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/115.0 Safari/537.36"
+}
+
+def _collect_media_links(page):
+    # Dedupe inline: scroll-loaded feeds repeat the same srcs many times
+    seen = set()
+    media_links = []
+
+    def add(src):
+        if src and "fbcdn.net" in src and src not in seen:
+            seen.add(src)
+            media_links.append(src)
+
+    try:
+        page.wait_for_selector(
+            "img[src*='pbs.twimg.com/media'], video, "
+            "img[data-visualcompletion='media-vc-image'], "
+            "img[src*='scontent']",
+            timeout=20000
+        )
+    except Exception:
+        print("[WARN] Media selector not found within 20s")
+
+    # Facebook videos
+    for el in page.query_selector_all("video"):
+        add(el.get_attribute("src"))
+
+    # Facebook images
+    for el in page.query_selector_all("img[data-visualcompletion='media-vc-image']"):
+        add(el.get_attribute("src"))
+
+    for el in page.query_selector_all("img[src*='scontent']"):
+        add(el.get_attribute("src"))
+
+    return media_links
+
 def scrape_media_urls(url: str):
     media_links = []
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        
-        page.set_extra_http_headers({
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                          "AppleWebKit/537.36 (KHTML, like Gecko) "
-                          "Chrome/115.0 Safari/537.36"
-        })
-        
+    with pool.acquire() as page:
+        page.set_extra_http_headers(SCRAPE_HEADERS)
         try:
             page.goto(url, timeout=60000, wait_until="domcontentloaded")
-            
-            try:
-                page.wait_for_selector(
-                    "img[src*='pbs.twimg.com/media'], video, "
-                    "img[data-visualcompletion='media-vc-image'], "
-                    "img[src*='scontent']",
-                    timeout=20000
-                )
-            except Exception:
-                print("[WARN] Media selector not found within 20s")
+            media_links = _collect_media_links(page)
+        except Exception as e:
+            print(f"[WARN] Error during scraping: {e}")
 
-            # Facebook videos
-            for el in page.query_selector_all("video"):
-                src = el.get_attribute("src")
-                if src and "fbcdn.net" in src:
-                    media_links.append(src)
+    print(f"[DEBUG] Scraped media links: {media_links}")
+    return media_links
 
-            # Facebook images
-            for el in page.query_selector_all("img[data-visualcompletion='media-vc-image']"):
-                src = el.get_attribute("src")
-                if src and "fbcdn.net" in src:
-                    media_links.append(src)
+def inspect_page(url: str, netloc: str | None = None) -> tuple[str | None, list[str]]:
+    """Classify the platform and scrape media links in one navigation.
 
-            for el in page.query_selector_all("img[src*='scontent']"):
-                src = el.get_attribute("src")
-                if src and "fbcdn.net" in src:
-                    media_links.append(src)
+    detect_platform + scrape_media_urls each cost a full page.goto on the
+    same URL; fusing them halves the browser round trips for Facebook.
+    Callers that already parsed the URL can pass the lowercased netloc.
+    """
+    domain = netloc if netloc is not None else urlparse(url).netloc.lower()
+    if "youtube.com" in domain or "youtu.be" in domain:
+        print("[DEBUG] Detected platform by domain: YouTube")
+        return "youtube", []
 
-        except Exception as e:
-            print(f"[WARN] Error during scraping: {e}")
-        finally:
-            browser.close()
+    platform = "facebook" if "facebook.com" in domain else None
+    if platform:
+        print("[DEBUG] Detected platform by domain: Facebook")
+        # Watch/Reels/Stories go straight to yt-dlp; don't pay a page.goto
+        # plus selector waits for links we only need if yt-dlp fails —
+        # download_media retries scrape_media_urls lazily in that branch
+        if _FB_VIDEO_RE.search(url):
+            return platform, []
 
-    seen = set()
-    unique_links = []
-    for m in media_links:
-        if m not in seen:
-            unique_links.append(m)
-            seen.add(m)
+    media_links = []
+    with pool.acquire() as page:
+        page.set_extra_http_headers(SCRAPE_HEADERS)
+        try:
+            page.goto(url, timeout=60000, wait_until="domcontentloaded")
+            if platform is None:
+                # Meta-tag sniff in the same session
+                if page.query_selector("meta[property='og:site_name'][content='Facebook']"):
+                    platform = "facebook"
+                elif page.query_selector("meta[itemprop='name'][content='YouTube']"):
+                    return "youtube", []
+            media_links = _collect_media_links(page)
+        except Exception as e:
+            print(f"[WARN] Error during page inspection: {e}")
 
-    print(f"[DEBUG] Scraped media links: {unique_links}")
-    return unique_links
+    print(f"[DEBUG] Scraped media links: {media_links}")
+    return platform, media_links
 
 # -------------------------
 # Download helpers
 # -------------------------
 def download_with_requests(url: str, save_dir: Path) -> Path | None:
-    save_dir.mkdir(parents=True, exist_ok=True)
     parsed = urlparse(url)
     filename = os.path.basename(parsed.path)
     if '.' not in filename:
@@ -155,22 +270,24 @@ def download_with_requests(url: str, save_dir: Path) -> Path | None:
         filename += ext
     local_filename = save_dir / filename
     try:
-        r = requests.get(url, stream=True, timeout=30)
+        r = SESSION.get(url, stream=True, timeout=30)
         r.raise_for_status()
+        # Copy straight from the raw socket in 1 MiB buffers instead of
+        # looping over 8 KiB iter_content chunks in Python
+        r.raw.decode_content = True
         with open(local_filename, 'wb') as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                f.write(chunk)
+            shutil.copyfileobj(r.raw, f, length=1024 * 1024)
         print(f"[INFO] Saved: {local_filename}")
         return local_filename
     except Exception as e:
         print(f"[ERROR] Failed to download {url}: {e}")
         return None
 
-def download_with_ytdlp(url: str, save_dir: Path) -> Path:
-    save_dir.mkdir(parents=True, exist_ok=True)
-
-    # Get domain name for prefix
-    domain = urlparse(url).netloc.lower().split('.')[-2]  # e.g., "facebook", "youtube"
+def download_with_ytdlp(url: str, save_dir: Path, netloc: str | None = None) -> Path:
+    # Get domain name for prefix, e.g. "facebook", "youtube"
+    if netloc is None:
+        netloc = urlparse(url).netloc.lower()
+    domain = netloc.split('.')[-2]
 
     # Find next available file number
     existing_files = list(save_dir.glob(f"{domain}_*"))
@@ -210,8 +327,8 @@ def download_with_ytdlp(url: str, save_dir: Path) -> Path:
 
     return final_path
 
-def get_photo_index(url: str) -> int:
-    parts = urlparse(url).path.split("/")
+def get_photo_index(path: str) -> int:
+    parts = path.split("/")
     if "photo" in parts:
         try:
             return int(parts[-1])  # last segment after "photo/"
@@ -223,14 +340,18 @@ def get_photo_index(url: str) -> int:
 # Unified download
 # -------------------------
 def download_media(url: str):
-    platform = detect_platform(url)
+    # Parse once; every helper below works off the same components
+    parsed = urlparse(url)
+    netloc = parsed.netloc.lower()
+
+    platform, media_links = inspect_page(url, netloc)
     if not platform:
         print("[ERROR] Unsupported or invalid URL.")
         return None
-    
+
     if platform == "youtube":
         try:
-            return download_with_ytdlp(url, VIDEO_DIR)
+            return download_with_ytdlp(url, VIDEO_DIR, netloc)
         except Exception as e:
             print(f"[WARN] yt-dlp failed for YouTube: {e}")
             print("[INFO] Skipping scraping fallback for YouTube.")
@@ -238,19 +359,24 @@ def download_media(url: str):
 
     
     if platform == "facebook":
-        path_lower = urlparse(url).path.lower()
-
         # Handle Watch, Reels, Stories
-        if any(k in path_lower for k in ("/watch", "/reel", "/videos","/stories")) or "story_fbid" in url.lower():
+        if _FB_VIDEO_RE.search(url):
             try:
-                return download_with_ytdlp(url, VIDEO_DIR)
+                return download_with_ytdlp(url, VIDEO_DIR, netloc)
             except Exception as e:
                 print(f"[WARN] yt-dlp failed for Facebook: {e}")
                 print("[INFO] Attempting scraping fallback…")
-                media_links = scrape_media_urls(url)
+                # inspect_page usually scraped these already; only retry if not
+                if not media_links:
+                    media_links = scrape_media_urls(url)
                 if media_links:
-                    vids = [m for m in media_links if get_media_type_from_url(m) == "video"]
-                    imgs = [m for m in media_links if get_media_type_from_url(m) == "image"]
+                    types = classify_many(media_links)
+                    vids, imgs = [], []
+                    for m in media_links:
+                        if types[m] == "video":
+                            vids.append(m)
+                        elif types[m] == "image":
+                            imgs.append(m)
 
                     if vids:
                         return download_with_requests(vids[0], VIDEO_DIR)
@@ -260,16 +386,20 @@ def download_media(url: str):
                 print("[ERROR] Fallback also failed or found no usable media.")
                 return None
 
-        media_links = scrape_media_urls(url)
         if media_links:
-            # Separate by type
-            vids = [m for m in media_links if get_media_type_from_url(m) == "video"]
-            imgs = [m for m in media_links if get_media_type_from_url(m) == "image"]
+            # Separate by type in one pass, probing all links in parallel
+            types = classify_many(media_links)
+            vids, imgs = [], []
+            for m in media_links:
+                if types[m] == "video":
+                    vids.append(m)
+                elif types[m] == "image":
+                    imgs.append(m)
 
             if vids:
                 return download_with_requests(vids[0], VIDEO_DIR)
             if imgs:
-                index = get_photo_index(url) - 1  # convert to 0-based
+                index = get_photo_index(parsed.path) - 1  # convert to 0-based
             if 0 <= index < len(imgs):
                 return download_with_requests(imgs[index], IMAGE_DIR)
             else:
@@ -280,18 +410,19 @@ def download_media(url: str):
         return None
 
 
-    media_links = scrape_media_urls(url)
     if not media_links:
         print("[WARN] No media links found.")
         return None
 
-    first_type = get_media_type_from_url(media_links[0])
-    if all(get_media_type_from_url(link) == "image" for link in media_links):
-        return download_with_requests(media_links[0], IMAGE_DIR)
-    if all(get_media_type_from_url(link) == "video" for link in media_links):
-        return download_with_requests(media_links[0], VIDEO_DIR)
-
-    target_dir = IMAGE_DIR if first_type == "image" else VIDEO_DIR
+    # Classify every link once instead of re-probing for each all() scan
+    link_types = classify_many(media_links)
+    types = [link_types[m] for m in media_links]
+    if all(t == "image" for t in types):
+        target_dir = IMAGE_DIR
+    elif all(t == "video" for t in types):
+        target_dir = VIDEO_DIR
+    else:
+        target_dir = IMAGE_DIR if types[0] == "image" else VIDEO_DIR
     return download_with_requests(media_links[0], target_dir)
 
 def get_media_type(file_path: str) -> str:
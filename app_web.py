@@ -1,17 +1,23 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, send_from_directory, abort
 from flask import url_for
 import mimetypes
-import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
 from pathlib import Path
 import os
-import cv2  
+import cv2
 from urllib.parse import urlparse
 
 
 # Import from your existing modules
-from app import download_media, get_media_type, predict_image, predict_video
+from app import IMAGE_DIR, VIDEO_DIR, download_media, get_media_type, predict_image, predict_video
 from plagiarism_scanner import scan_text, scan_file
+from video_model import predict_video_sampled
+
+MAX_VIDEO_SAMPLES = 24
 
 # 1️⃣ Create the Flask app
 app = Flask(__name__)
@@ -19,6 +25,22 @@ app = Flask(__name__)
 # File upload config
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
+# Background worker for URL analysis: download + inference can take tens
+# of seconds and must not block the request thread. Single worker on
+# purpose — the MediaPipe detector and the compiled models are not safe
+# to drive from two threads at once; extra jobs just queue
+ANALYZE_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+ANALYZE_JOBS = {}  # job_id -> (Future, submitted_at)
+JOB_TTL = 600  # seconds a finished-but-unpolled job stays retrievable
+
+def _evict_stale_jobs():
+    # Clients that navigate away never collect their result, so finished
+    # jobs (payload included) would sit in the dict for the life of the
+    # worker; drop any nobody polled within the TTL
+    cutoff = time.time() - JOB_TTL
+    for job_id, (future, submitted) in list(ANALYZE_JOBS.items()):
+        if future.done() and submitted < cutoff:
+            ANALYZE_JOBS.pop(job_id, None)
 
 # 2️⃣ Define routes
 @app.route("/")
@@ -33,51 +55,86 @@ def deepfake():
 def plagiarism():
     return render_template("plag.html")
 
+# Serve downloaded media straight from data/ instead of copying each file
+# into static/uploads; conditional=True gives If-Modified-Since + Range
+# support, which HTML5 video needs for seeking
+@app.route("/media/<path:name>")
+def media(name):
+    for directory in (VIDEO_DIR, IMAGE_DIR):
+        if (directory / name).is_file():
+            return send_from_directory(directory, name, conditional=True)
+    abort(404)
+
 # --- Deepfake Detector ---
+def _run_url_analysis(url):
+    """Worker-side analysis; returns (payload, http_status)."""
+    # 1. Download media (returns a local path)
+    media_path = download_media(url)
+    if not media_path:
+        return {"error": "Download failed"}, 500
+
+    # 2. Detect media type
+    media_type = get_media_type(media_path)
+
+    # 3. Run AI model
+    if media_type == "image":
+        label, realism, deepfake = predict_image(media_path)
+    elif media_type == "video":
+        # Cap inference at evenly spaced samples so long clips don't
+        # pay per-frame model cost
+        cap = cv2.VideoCapture(str(media_path))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        if total_frames <= 0:
+            return {"error": "Could not read video"}, 500
+        step = max(1, total_frames // MAX_VIDEO_SAMPLES)
+        indices = list(range(0, total_frames, step))[:MAX_VIDEO_SAMPLES]
+        label, realism, deepfake = predict_video_sampled(media_path, indices)
+    else:
+        return {"error": "Unsupported media type"}, 400
+
+    # 4. Return only safe JSON (no binary data)
+    return {
+        "domain": urlparse(url).netloc,
+        "type": media_type,
+        "label": label,
+        "realism": realism,
+        "deepfake": deepfake,
+        "file_name": Path(media_path).name
+    }, 200
+
 @app.route("/analyze/url")
 def analyze_url():
     url = request.args.get("url")
     if not url:
         return jsonify({"error": "No URL provided"}), 400
 
+    # Queue the heavy work so this request returns immediately and the
+    # server stays responsive while the browser polls for the result
+    _evict_stale_jobs()
+    job_id = uuid.uuid4().hex
+    ANALYZE_JOBS[job_id] = (ANALYZE_EXECUTOR.submit(_run_url_analysis, url), time.time())
+    return jsonify({"job_id": job_id}), 202
+
+@app.route("/analyze/status/<job_id>")
+def analyze_status(job_id):
+    future, _ = ANALYZE_JOBS.get(job_id, (None, None))
+    if future is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if not future.done():
+        return jsonify({"status": "pending"})
+
+    ANALYZE_JOBS.pop(job_id, None)
     try:
-        # 1. Download media (returns a local path)
-        media_path = download_media(url)
-        if not media_path:
-            return jsonify({"error": "Download failed"}), 500
-
-        # 2. Detect media type
-        media_type = get_media_type(media_path)
-
-        # 3. Copy file to static/uploads for preview
-        static_preview = Path("static/uploads") / Path(media_path).name
-        Path("static/uploads").mkdir(parents=True, exist_ok=True)
-        shutil.copy(media_path, static_preview)
-
-        # 4. Build preview URL (not the file itself)
-        preview_url = url_for("static", filename=f"uploads/{Path(media_path).name}", _external=True)
-
-        # 5. Run AI model
-        if media_type == "image":
-            label, realism, deepfake = predict_image(media_path)
-        elif media_type == "video":
-            label, realism, deepfake = predict_video(media_path)
-        else:
-            return jsonify({"error": "Unsupported media type"}), 400
-
-        # 6. Return only safe JSON (no binary data)
-        return jsonify({
-            "domain": urlparse(url).netloc,
-            "type": media_type,
-            "label": label,
-            "realism": realism,
-            "deepfake": deepfake,
-            "preview": preview_url
-        })
-
+        payload, status = future.result()
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+    if status == 200:
+        # Build the preview URL here, where a request context exists
+        payload["preview"] = url_for("media", name=payload.pop("file_name"), _external=True)
+    return jsonify(payload), status
+
 
 
 # --- Plagiarism Checker (Text + File Upload) ---
@@ -112,5 +169,17 @@ def analyze_plag():
 
 
 # 3️⃣ Run the app
+def _warm_models():
+    """Pre-load the lazily-initialized models so the first user request
+    doesn't pay the multi-second weight load."""
+    try:
+        import image_model
+        import video_model
+        image_model._get_model()
+        video_model._get_model()
+    except Exception as e:
+        print(f"[WARN] Model warmup failed: {e}")
+
 if __name__ == "__main__":
+    threading.Thread(target=_warm_models, daemon=True).start()
     app.run(debug=True)
@@ -0,0 +1,43 @@
+"""One-time export of the deepfake ViT to ONNX for TensorRT serving.
+
+Usage:
+    python export_vit_onnx.py [vit.onnx]
+
+then build the FP16 engine on the target GPU:
+
+    trtexec --onnx=vit.onnx --fp16 \
+        --minShapes=pixel_values:1x3x224x224 \
+        --optShapes=pixel_values:32x3x224x224 \
+        --maxShapes=pixel_values:64x3x224x224 \
+        --saveEngine=vit.plan
+
+and point the app at it with VIT_TRT_ENGINE=vit.plan.
+"""
+import sys
+
+import torch
+from transformers import ViTForImageClassification
+
+from video_model import MODEL_NAME
+
+def main():
+    out_path = sys.argv[1] if len(sys.argv) > 1 else "vit.onnx"
+
+    print(f"[INFO] Loading {MODEL_NAME} for export...")
+    model = ViTForImageClassification.from_pretrained(MODEL_NAME)
+    model.eval()
+
+    dummy = torch.zeros(1, 3, 224, 224)
+    torch.onnx.export(
+        model,
+        (dummy,),
+        out_path,
+        opset_version=17,
+        input_names=["pixel_values"],
+        output_names=["logits"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+    )
+    print(f"[INFO] Exported ONNX model to {out_path}")
+
+if __name__ == "__main__":
+    main()
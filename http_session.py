@@ -0,0 +1,20 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# One process-wide session so repeated requests to the same host (Facebook
+# CDN, Brave API, search-result domains) reuse TCP/TLS connections instead
+# of paying a fresh handshake each time.
+
+def make_session(pool_connections=20, pool_maxsize=50) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=Retry(total=2, backoff_factor=0.3),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+SESSION = make_session()
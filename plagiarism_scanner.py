@@ -1,16 +1,34 @@
+import hashlib
+import json
 import os
 import re
-import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 from bs4 import BeautifulSoup
 from docx import Document
 from dotenv import load_dotenv
+
+from http_session import SESSION
 import nltk
 
-# Ensure punkt is available
-try:
-    nltk.data.find("tokenizers/punkt")
-except LookupError:
-    nltk.download("punkt")
+# Ensure punkt is available, but only when first needed: the data lookup
+# (and a possible download) is too slow to pay at import time
+_punkt_ready = False
+_punkt_lock = threading.Lock()
+
+def _ensure_punkt():
+    global _punkt_ready
+    if not _punkt_ready:
+        with _punkt_lock:
+            if not _punkt_ready:
+                try:
+                    nltk.data.find("tokenizers/punkt")
+                except LookupError:
+                    nltk.download("punkt")
+                _punkt_ready = True
 
 # ---------------------------
 # Config
@@ -19,28 +37,96 @@ load_dotenv()
 
 BRAVE_API_KEY = os.getenv("BRAVE_API_KEY")
 BRAVE_URL = "https://api.search.brave.com/res/v1/web/search"
+POOL_SIZE = 10
+CACHE_TTL = 7 * 86400  # a week; scanned sources rarely change faster
+
+# ---------------------------
+# Response cache
+# ---------------------------
+class ResponseCache:
+    """Tiny on-disk TTL cache, one JSON file per md5(key)."""
+
+    def __init__(self, cache_dir, ttl=CACHE_TTL):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / (hashlib.md5(key.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, key: str):
+        try:
+            entry = json.loads(self._path(key).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry["timestamp"] > self.ttl:
+            return None
+        return entry["value"]
+
+    def set(self, key: str, value):
+        try:
+            self._path(key).write_text(
+                json.dumps({"timestamp": time.time(), "value": value}),
+                encoding="utf-8",
+            )
+        except OSError:
+            pass  # cache is best-effort
+
+SEARCH_CACHE = ResponseCache("cache/brave")
+PAGE_CACHE = ResponseCache("cache/pages")
 
 # ---------------------------
 # File extractor
 # ---------------------------
 def extract_docx(file_path):
+    """Return the document's non-empty paragraphs as a list of strings."""
     doc = Document(file_path)
-    return "\n".join([p.text for p in doc.paragraphs if p.text.strip()])
+    return [p.text.strip() for p in doc.paragraphs if p.text.strip()]
 
 # ---------------------------
 # Helpers
 # ---------------------------
+_NORM_RE = re.compile(r"\W+")
+
 def normalize(s: str) -> str:
-    return re.sub(r"\W+", " ", s).lower().strip()
+    return _NORM_RE.sub(" ", s).lower().strip()
 
 def token_overlap_ratio(a: str, b: str) -> float:
-    a_tokens = set(a.split())
-    b_tokens = set(b.split())
+    return token_overlap_ratio_tokens(set(a.split()), set(b.split()))
+
+def token_overlap_ratio_tokens(a_tokens: set, b_tokens: set) -> float:
     if not a_tokens:
         return 0.0
     return len(a_tokens & b_tokens) / len(a_tokens)
 
+# Rabin-Karp rolling hashes over k-word grams. Unlike a bag-of-words
+# overlap, matching grams require the words in sequence, so this is a
+# much stronger signal for verbatim copying.
+FINGERPRINT_K = 5
+_HASH_BASE = 256
+_HASH_MOD = 1_000_000_007
+
+def kgram_fingerprints(tokens, k=FINGERPRINT_K):
+    if len(tokens) < k:
+        return frozenset()
+    vals = [hash(t) % _HASH_MOD for t in tokens]
+    power = pow(_HASH_BASE, k - 1, _HASH_MOD)
+    h = 0
+    for v in vals[:k]:
+        h = (h * _HASH_BASE + v) % _HASH_MOD
+    fps = {h}
+    for i in range(k, len(vals)):
+        h = ((h - vals[i - k] * power) * _HASH_BASE + vals[i]) % _HASH_MOD
+        fps.add(h)
+    return frozenset(fps)
+
+def fingerprint_overlap_ratio(a_fps, b_fps) -> float:
+    if not a_fps:
+        return 0.0
+    return len(a_fps & b_fps) / len(a_fps)
+
 def split_paragraphs(text: str):
+    _ensure_punkt()
     raw_paragraphs = text.split("\n")
     paragraphs = [p.strip() for p in raw_paragraphs if p.strip()]
     return paragraphs
@@ -64,41 +150,74 @@ def make_queries(paragraph):
 
     return list(set(q for q in queries if q.strip()))
 
-def web_verify(paragraph, max_results=10):
-    queries = make_queries(paragraph)
+def brave_search(q, max_results=10):
+    cache_key = f"{normalize(q)}|{max_results}"
+    cached = SEARCH_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    headers = {"X-Subscription-Token": BRAVE_API_KEY}
+    params = {"q": q, "count": max_results}
+    try:
+        resp = SESSION.get(BRAVE_URL, headers=headers, params=params, timeout=10).json()
+        if "web" not in resp or "results" not in resp["web"]:
+            return []
+        links = [item.get("url") for item in resp["web"]["results"][:max_results] if item.get("url")]
+        SEARCH_CACHE.set(cache_key, links)
+        return links
+    except Exception as e:
+        print("[ERROR] Brave search failed:", e)
+        return []
+
+def fetch_page_text(link):
+    cached = PAGE_CACHE.get(link)
+    if cached is not None:
+        return cached
+
+    try:
+        page = SESSION.get(link, timeout=10).text
+        soup = BeautifulSoup(page, "lxml")
+        text = normalize(" ".join(soup.stripped_strings))
+        PAGE_CACHE.set(link, text)
+        return text
+    except Exception:
+        return None
 
-    for q in queries:
-        headers = {"X-Subscription-Token": BRAVE_API_KEY}
-        params = {"q": q, "count": max_results}
-
-        try:
-            resp = requests.get(BRAVE_URL, headers=headers, params=params, timeout=10).json()
-            if "web" not in resp or "results" not in resp["web"]:
+def web_verify(paragraph, max_results=10):
+    # Queries under 15 words match half the web; drop them before paying
+    # for searches, fetches, or parses on their behalf
+    queries = [q for q in make_queries(paragraph) if len(q.split()) >= 15]
+    if not queries:
+        return "ORIGINAL", None
+
+    q_words = {q: normalize(q).split() for q in queries}
+    q_tokens = {q: set(q_words[q]) for q in queries}
+    q_fps = {q: kgram_fingerprints(q_words[q]) for q in queries}
+
+    # All Brave searches and candidate-page fetches are independent I/O,
+    # so fan them out instead of paying each latency back-to-back.
+    with ThreadPoolExecutor(max_workers=POOL_SIZE) as executor:
+        hits = executor.map(lambda q: brave_search(q, max_results), queries)
+
+        candidates = []
+        seen = set()
+        for q, links in zip(queries, hits):
+            for link in links:
+                if link not in seen:
+                    seen.add(link)
+                    candidates.append((q, link))
+
+        texts = executor.map(lambda c: fetch_page_text(c[1]), candidates)
+        for (q, link), text in zip(candidates, texts):
+            if text is None:
                 continue
 
-            for item in resp["web"]["results"][:max_results]:
-                link = item.get("url")
-                if not link:
-                    continue
-
-                try:
-                    page = requests.get(link, timeout=10).text
-                    soup = BeautifulSoup(page, "html.parser")
-                    text = normalize(soup.get_text(separator=" ", strip=True))
-
-                    words_q = set(q.split())
-                    if len(words_q) < 15:
-                        return "ORIGINAL", None
-
-                    if token_overlap_ratio(normalize(q), text) >= 0.9:
-                        return "PLAGIARISM (exact)", link
-                    elif token_overlap_ratio(normalize(q), text) >= 0.7:
-                        return "PLAGIARISM (paraphrase)", link
-
-                except Exception:
-                    continue
-        except Exception as e:
-            print("[ERROR] Brave search failed:", e)
+            # Split the page text once and reuse for both checks
+            page_words = text.split()
+            if fingerprint_overlap_ratio(q_fps[q], kgram_fingerprints(page_words)) >= 0.9:
+                return "PLAGIARISM (exact)", link
+            elif token_overlap_ratio_tokens(q_tokens[q], set(page_words)) >= 0.7:
+                return "PLAGIARISM (paraphrase)", link
 
     return "ORIGINAL", None
 
@@ -109,8 +228,11 @@ def _scan_paragraphs(paragraphs):
     results = []
     plagiarized = exact = paraphrase = 0
 
-    for idx, para in enumerate(paragraphs, 1):
-        label, source = web_verify(para)
+    # Paragraphs are verified independently, so overlap their network waits
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        verdicts = list(executor.map(web_verify, paragraphs))
+
+    for para, (label, source) in zip(paragraphs, verdicts):
         results.append({"paragraph": para, "label": label, "web_source": source})
 
         if label.startswith("PLAGIARISM"):
@@ -141,8 +263,7 @@ def scan_file(file_path):
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
 
-    text = extract_docx(file_path)
-    paragraphs = split_paragraphs(text)
+    paragraphs = extract_docx(file_path)
     return _scan_paragraphs(paragraphs)
 
 def scan_text(text: str):
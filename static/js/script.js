@@ -20,8 +20,23 @@ document.addEventListener("DOMContentLoaded", () => {
       deepfakeResultBox.innerHTML = "⏳ Checking...";
 
       try {
-        const res = await fetch(`/analyze/url?url=${encodeURIComponent(url)}`);
-        const data = await res.json();
+        const submitRes = await fetch(`/analyze/url?url=${encodeURIComponent(url)}`);
+        const job = await submitRes.json();
+
+        if (!submitRes.ok) {
+          deepfakeResultBox.className = "alert alert-danger";
+          deepfakeResultBox.innerHTML = job.error || "Something went wrong";
+          return;
+        }
+
+        // Poll until the background job finishes
+        let res, data;
+        while (true) {
+          res = await fetch(`/analyze/status/${job.job_id}`);
+          data = await res.json();
+          if (!res.ok || data.status !== "pending") break;
+          await new Promise((resolve) => setTimeout(resolve, 2000));
+        }
 
         if (!res.ok) {
           deepfakeResultBox.className = "alert alert-danger";
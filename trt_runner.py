@@ -0,0 +1,31 @@
+import torch
+
+class TRTRunner:
+    """Runs a serialized TensorRT engine built from the exported ViT.
+
+    Input/output device memory is borrowed from torch CUDA tensors, so the
+    caller keeps working with tensors and the engine only sees addresses.
+    Build the engine once with export_vit_onnx.py + trtexec.
+    """
+
+    def __init__(self, engine_path: str):
+        import tensorrt as trt  # deployment-only dependency
+
+        logger = trt.Logger(trt.Logger.WARNING)
+        with open(engine_path, "rb") as f, trt.Runtime(logger) as runtime:
+            self.engine = runtime.deserialize_cuda_engine(f.read())
+        self.context = self.engine.create_execution_context()
+
+    def __call__(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        # The engine reads raw memory in linear NCHW order; a permuted
+        # (channels_last-strided) tensor would be read in the wrong layout
+        assert pixel_values.is_contiguous(), "TRT input must be NCHW-contiguous"
+        self.context.set_input_shape("pixel_values", tuple(pixel_values.shape))
+        logits = torch.empty(
+            tuple(self.context.get_tensor_shape("logits")),
+            dtype=torch.float32, device=pixel_values.device,
+        )
+        self.context.set_tensor_address("pixel_values", pixel_values.data_ptr())
+        self.context.set_tensor_address("logits", logits.data_ptr())
+        self.context.execute_async_v3(torch.cuda.current_stream().cuda_stream)
+        return logits
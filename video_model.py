@@ -1,100 +1,195 @@
+import atexit
+import collections
 import cv2
+import numpy as np
 import sys
 import os
-import statistics
+import queue
+import threading
 import torch
-from PIL import Image
-from transformers import ViTForImageClassification, ViTImageProcessor
+from transformers import AutoImageProcessor, ViTForImageClassification
 import mediapipe as mp
 
 MODEL_NAME = "prithivMLmods/Deep-Fake-Detector-v2-Model"
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-print(f"[INFO] Loading Video DeepFake Detector v2 from {MODEL_NAME} on {device}...")
-processor = ViTImageProcessor.from_pretrained(MODEL_NAME)
-model = ViTForImageClassification.from_pretrained(MODEL_NAME).to(device)
-model.eval()
-
 # Explicit label mapping
-model.config.id2label = {0: "Deepfake", 1: "Realism"}
-model.config.label2id = {"Deepfake": 0, "Realism": 1}
+id2label = {0: "Deepfake", 1: "Realism"}
+label2id = {"Deepfake": 0, "Realism": 1}
+REAL_IDX = label2id["Realism"]
+FAKE_IDX = label2id["Deepfake"]
+
+MAX_BATCH = 32
+
+# Defer the multi-second weight load off import time; the first scored
+# frame triggers it, under a lock for concurrent web workers
+_model = None
+_processor = None
+_mean_t = None
+_std_t = None
+_trt_runner = None
+_load_done = False
+_load_lock = threading.Lock()
+
+def _get_model():
+    global _model, _processor, _mean_t, _std_t, _trt_runner, _load_done
+    if not _load_done:
+        with _load_lock:
+            if not _load_done:
+                # The processor is only consulted for its normalization
+                # constants; preprocessing itself runs as fused tensor ops
+                # in _score_faces
+                _processor = AutoImageProcessor.from_pretrained(MODEL_NAME, use_fast=True)
+                _mean_t = torch.tensor(_processor.image_mean, device=device).view(1, 3, 1, 1)
+                _std_t = torch.tensor(_processor.image_std, device=device).view(1, 3, 1, 1)
+
+                # Deployment boxes can serve a pre-built TensorRT FP16
+                # engine (see export_vit_onnx.py); everything else runs
+                # the PyTorch path below
+                engine_path = os.getenv("VIT_TRT_ENGINE")
+                if engine_path and device.type == "cuda":
+                    try:
+                        from trt_runner import TRTRunner
+                        _trt_runner = TRTRunner(engine_path)
+                        print(f"[INFO] Serving ViT with TensorRT engine {engine_path}")
+                    except Exception as e:
+                        print(f"[WARN] TensorRT engine unavailable, falling back to PyTorch: {e}")
+
+                if _trt_runner is None:
+                    print(f"[INFO] Loading Video DeepFake Detector v2 from {MODEL_NAME} on {device}...")
+                    model = ViTForImageClassification.from_pretrained(MODEL_NAME).to(device)
+                    model.eval()
+                    model.config.id2label = id2label
+                    model.config.label2id = label2id
 
-# Init MediaPipe face detector
+                    # BF16 halves activation bandwidth and runs the matmuls on
+                    # Tensor Cores; max-autotune lets Inductor fuse the
+                    # attention/MLP kernels and capture CUDA graphs
+                    if device.type == "cuda":
+                        model = model.to(dtype=torch.bfloat16)
+                        try:
+                            model = torch.compile(model, mode="max-autotune", fullgraph=True)
+                            # Warm up at the serving batch shape so compilation
+                            # and graph capture happen here, not mid-video
+                            with torch.inference_mode():
+                                model(pixel_values=torch.zeros(
+                                    MAX_BATCH, 3, 224, 224,
+                                    dtype=torch.bfloat16, device=device))
+                        except Exception as e:
+                            print(f"[WARN] torch.compile unavailable, running eager: {e}")
+
+                    _model = model
+
+                _load_done = True
+    return _model, _processor
+
+# Init MediaPipe face detector. One session serves every video (detection
+# runs on a single thread here, which matches FaceDetection's thread
+# safety); close the previous session on importlib.reload so the old
+# TFLite interpreter doesn't leak, and close at exit.
 mp_face_detection = mp.solutions.face_detection
+if globals().get("face_detector") is not None:
+    face_detector.close()
 face_detector = mp_face_detection.FaceDetection(model_selection=0, min_detection_confidence=0.5)
+atexit.register(face_detector.close)
+
+# Long edge fed to the detector; it resizes to 128px internally anyway,
+# so a 1080p input just wastes a big CPU resize per frame
+DETECT_LONG_EDGE = 320
 
 
 def extract_faces(frame):
-    """Detect and crop faces from a frame using MediaPipe"""
+    """Detect and crop faces from a BGR frame using MediaPipe.
+
+    Crops come back in RGB, sliced from the same converted array MediaPipe
+    already needed, so no second color conversion happens downstream.
+    """
     rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = face_detector.process(rgb)
+
+    # Detect on a downscaled copy; boxes are normalized [0,1] so the
+    # crop math below still uses the full-resolution dimensions
+    h, w, _ = frame.shape
+    scale = DETECT_LONG_EDGE / max(h, w)
+    if scale < 1.0:
+        small = cv2.resize(rgb, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    else:
+        small = rgb
+    results = face_detector.process(small)
 
     faces = []
     if results.detections:
-        h, w, _ = frame.shape
-        for detection in results.detections:
-            bboxC = detection.location_data.relative_bounding_box
-            x, y, bw, bh = (
-                int(bboxC.xmin * w),
-                int(bboxC.ymin * h),
-                int(bboxC.width * w),
-                int(bboxC.height * h),
-            )
-            # Ensure valid cropping region
-            x, y = max(0, x), max(0, y)
-            bw, bh = max(1, bw), max(1, bh)
-            crop = frame[y:y+bh, x:x+bw]
+        # Unpack all boxes with one NumPy multiply/cast instead of
+        # per-field attribute access + int() per detection
+        boxes = np.array(
+            [(d.location_data.relative_bounding_box.xmin,
+              d.location_data.relative_bounding_box.ymin,
+              d.location_data.relative_bounding_box.width,
+              d.location_data.relative_bounding_box.height)
+             for d in results.detections],
+            dtype=np.float32,
+        )
+        boxes *= np.array([w, h, w, h], dtype=np.float32)
+        boxes = boxes.astype(np.int32)
+        # Ensure valid cropping regions
+        np.maximum(boxes[:, :2], 0, out=boxes[:, :2])
+        np.maximum(boxes[:, 2:], 1, out=boxes[:, 2:])
+
+        for x, y, bw, bh in boxes:
+            crop = rgb[y:y+bh, x:x+bw]
             if crop.size > 0:
                 faces.append(crop)
     return faces
 
 
-def predict_video(video_path, num_samples=25):
-    if not os.path.exists(video_path):
-        raise FileNotFoundError(f"Video not found: {video_path}")
+def _score_faces(faces):
+    """Run the ViT over all collected faces in batched forward passes.
 
-    cap = cv2.VideoCapture(video_path)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    One [N,3,224,224] batch (chunked at MAX_BATCH) replaces N separate
+    forwards, amortizing preprocessing, kernel launches, and the final
+    device->host copy.
+    """
+    if not faces:
+        return [], []
 
-    if total_frames == 0:
-        print("[ERROR] No frames found in video.")
-        return None
-
-    # Dynamic sampling: pick evenly spaced frames
-    step = max(1, total_frames // num_samples)
-
-    realism_scores, deepfake_scores = [], []
-    frame_count = 0
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        if frame_count % step == 0:
-            faces = extract_faces(frame)
+    model, _ = _get_model()
+    # Resize to the model input size and ship one uint8 batch to the
+    # device; rescale + normalize then run as fused pointwise ops there
+    # instead of the processor's four separate CPU passes
+    # INTER_AREA is OpenCV's SIMD box filter - the right filter for the
+    # usual crop-larger-than-224 downscale
+    batch = np.stack([cv2.resize(face, (224, 224), interpolation=cv2.INTER_AREA)
+                      for face in faces])
+    pixel_values = torch.from_numpy(batch).to(device, non_blocking=True)
+    pixel_values = (pixel_values.permute(0, 3, 1, 2).float()
+                    .mul_(1.0 / 255.0).sub_(_mean_t).div_(_std_t))
 
-            if not faces:  # fallback: use full frame
-                faces = [frame]
-
-            for face in faces:
-                image = Image.fromarray(cv2.cvtColor(face, cv2.COLOR_BGR2RGB)).resize((224, 224))
-                inputs = processor(images=image, return_tensors="pt").to(device)
+    if _trt_runner is not None:
+        # The permute leaves the batch channels_last-strided; the engine
+        # reads raw NCHW memory, so it must be made contiguous first
+        pixel_values = pixel_values.contiguous()
+        forward = _trt_runner  # engine I/O is float32
+    else:
+        if device.type == "cuda":
+            pixel_values = pixel_values.to(torch.bfloat16)
+        forward = lambda x: model(pixel_values=x).logits
 
-                with torch.no_grad():
-                    outputs = model(**inputs)
-                    probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
+    logits = []
+    with torch.inference_mode():
+        for i in range(0, len(faces), MAX_BATCH):
+            logits.append(forward(pixel_values[i:i + MAX_BATCH]))
+        all_logits = torch.cat(logits).float()
+        # For two classes softmax reduces to a sigmoid over the logit
+        # margin: p_fake = sigmoid(l_fake - l_real), p_real = 1 - p_fake
+        fake_probs = torch.sigmoid(all_logits[:, FAKE_IDX] - all_logits[:, REAL_IDX]).cpu()
 
-                realism_scores.append(probs[0, model.config.label2id["Realism"]].item())
-                deepfake_scores.append(probs[0, model.config.label2id["Deepfake"]].item())
+    return (1.0 - fake_probs).tolist(), fake_probs.tolist()
 
-        frame_count += 1
-
-    cap.release()
 
-    # Aggregate results with median for robustness
-    Real = float(statistics.median(realism_scores)) if realism_scores else 0.0
-    Deepfake = float(statistics.median(deepfake_scores)) if deepfake_scores else 0.0
+def _aggregate_scores(video_path, realism_scores, deepfake_scores):
+    # Aggregate results with median for robustness (np.median is a C-level
+    # selection instead of a Python-list sort)
+    Real = float(np.median(realism_scores)) if realism_scores else 0.0
+    Deepfake = float(np.median(deepfake_scores)) if deepfake_scores else 0.0
 
     THRESHOLD = 0.2149
     if Deepfake >= THRESHOLD:
@@ -107,6 +202,150 @@ def predict_video(video_path, num_samples=25):
         return label, Real, None
 
 
+# Decode and face-detect run on different resources (OpenCV releases the
+# GIL while the codec works), so a producer thread feeding a bounded queue
+# lets decoding of the next frame overlap MediaPipe on the current one.
+def _decode_all(cap, step, frames_q):
+    frame_count = 0
+    while cap.grab():
+        if frame_count % step == 0:
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            frames_q.put(frame)
+        frame_count += 1
+    frames_q.put(None)  # sentinel
+
+
+def _decode_indices(cap, frame_indices, frames_q):
+    for idx in frame_indices:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+        ret, frame = cap.read()
+        if ret:
+            frames_q.put(frame)
+    frames_q.put(None)  # sentinel
+
+
+def _frame_phash(frame):
+    """64-bit perceptual hash of a frame (8x8 low-frequency DCT signs)."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    dct = cv2.dct(small)[:8, :8]
+    return dct > np.median(dct)
+
+
+def _collect_faces_pipelined(cap, producer, *args):
+    """Returns (faces, frames_seen, frames_with_faces).
+
+    Frames with no detected face contribute the full frame as a fallback;
+    the counters let callers bail out when nothing had a face at all.
+    Consecutive near-identical full frames (static face-less clips, title
+    cards) are deduped by perceptual hash so they cost one ViT forward
+    instead of one per sample.
+    """
+    frames_q = queue.Queue(maxsize=8)
+    worker = threading.Thread(target=producer, args=(cap, *args, frames_q), daemon=True)
+    worker.start()
+
+    faces = []
+    frames_seen = 0
+    frames_with_faces = 0
+    recent_hashes = collections.deque(maxlen=3)
+    while True:
+        frame = frames_q.get()
+        if frame is None:
+            break
+        frames_seen += 1
+        detected = extract_faces(frame)
+        if detected:
+            frames_with_faces += 1
+            faces.extend(detected)
+        else:  # fallback: use full frame, unless it duplicates a recent one
+            phash = _frame_phash(frame)
+            if any(np.count_nonzero(phash != h) < 5 for h in recent_hashes):
+                continue
+            recent_hashes.append(phash)
+            faces.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+    worker.join()
+    cap.release()
+    return faces, frames_seen, frames_with_faces
+
+
+def _face_hit_rate_gate(video_path, faces, frames_seen, frames_with_faces):
+    """Decide whether inference is worth running for the sampled faces."""
+    if frames_seen and frames_with_faces == 0:
+        # Scoring background scenery with a face-forensics model is pure
+        # wasted compute and an uninformative verdict
+        print(f"[WARN] No faces detected in any sampled frame of "
+              f"{os.path.basename(video_path)}; skipping model inference.")
+        return False
+    if frames_seen and frames_with_faces / frames_seen < 0.1:
+        print(f"[WARN] Faces detected in only {frames_with_faces}/{frames_seen} "
+              f"sampled frames; result may be unreliable.")
+    return bool(faces)
+
+
+def predict_video_sampled(video_path, frame_indices):
+    """Score only the given frame indices, seeking instead of decoding all."""
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(f"Video not found: {video_path}")
+
+    cap = cv2.VideoCapture(video_path)
+    faces, frames_seen, frames_with_faces = _collect_faces_pipelined(
+        cap, _decode_indices, frame_indices)
+
+    if frames_seen == 0:
+        # Some containers seek unreliably (e.g. MJPEG); fall back to the
+        # linear grab() walk
+        print("[WARN] Frame seeking produced no frames, falling back to linear scan.")
+        cap = cv2.VideoCapture(video_path)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        step = max(1, total_frames // max(1, len(frame_indices)))
+        faces, frames_seen, frames_with_faces = _collect_faces_pipelined(
+            cap, _decode_all, step)
+
+    if not _face_hit_rate_gate(video_path, faces, frames_seen, frames_with_faces):
+        return "UNKNOWN", 0.0, 0.0
+
+    realism_scores, deepfake_scores = _score_faces(faces)
+    return _aggregate_scores(video_path, realism_scores, deepfake_scores)
+
+
+def predict_video(video_path, num_samples=25):
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(f"Video not found: {video_path}")
+
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    if total_frames == 0:
+        print("[ERROR] No frames found in video.")
+        return None
+
+    # Seek straight to evenly spaced frames; for H.264/H.265 OpenCV jumps
+    # to the nearest keyframe and decodes forward one GOP at most, instead
+    # of walking every frame in the clip
+    indices = np.linspace(0, total_frames - 1, min(num_samples, total_frames), dtype=np.int64)
+    faces, frames_seen, frames_with_faces = _collect_faces_pipelined(
+        cap, _decode_indices, indices)
+
+    if frames_seen == 0:
+        # Some containers seek unreliably (e.g. MJPEG); fall back to the
+        # linear grab() walk
+        print("[WARN] Frame seeking produced no frames, falling back to linear scan.")
+        cap = cv2.VideoCapture(video_path)
+        step = max(1, total_frames // num_samples)
+        faces, frames_seen, frames_with_faces = _collect_faces_pipelined(
+            cap, _decode_all, step)
+
+    if not _face_hit_rate_gate(video_path, faces, frames_seen, frames_with_faces):
+        return "UNKNOWN", 0.0, 0.0
+
+    realism_scores, deepfake_scores = _score_faces(faces)
+    return _aggregate_scores(video_path, realism_scores, deepfake_scores)
+
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: python video_model.py <video_path>")